@@ -1,23 +1,82 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
 from django.forms import ValidationError
 from django.forms.models import BaseInlineFormSet
 
+from . import shopping_totals
+from .export import export_response
+from .jobs import enqueue
 from .models import (
     Favorite,
     Ingredient,
+    Job,
     Recipe,
     RecipeIngredientAmount,
     ShoppingCart,
     Tag,
 )
+from .pagination import EstimatedCountPaginator
+from .signals import touch_recipes
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех значений поля."""
+
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': self.value() or '',
+            'hidden_params': [
+                (name, value)
+                for name, value in changelist.params.items()
+                if name not in (self.parameter_name, 'p')
+            ],
+        }
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            return queryset.filter(**{self.lookup: self.value().strip()})
+        except (ValueError, ValidationError) as error:
+            raise IncorrectLookupParameters(error)
+
+
+def input_filter(lookup, title):
+    return type(
+        f'{lookup.title().replace("_", "")}InputFilter',
+        (InputFilter,),
+        {'lookup': lookup, 'title': title, 'parameter_name': lookup},
+    )
+
+
+@admin.action(description='Выгрузить выбранные записи в CSV')
+def export_csv(modeladmin, request, queryset):
+    return export_response(queryset)
+
+
+class ChangeListAdmin(admin.ModelAdmin):
+    """Список объектов без полного подсчета строк большой таблицы."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 30
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ChangeListAdmin):
     list_display = ('name', 'measurement_unit')
     search_fields = ('name',)
-    list_filter = ('name',)
-    list_per_page = 30
+    list_filter = ('measurement_unit',)
 
 
 class RequiredInlineFormSet(BaseInlineFormSet):
@@ -42,7 +101,7 @@ class IngredientInline(admin.StackedInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ChangeListAdmin):
     inlines = (IngredientInline,)
     fields = (
         'author',
@@ -51,42 +110,105 @@ class RecipeAdmin(admin.ModelAdmin):
         'text',
         'tags',
         'cooking_time',
-        'fav_recipe_count',
+        'favorites_count',
+        'in_carts_count',
     )
-    readonly_fields = ('fav_recipe_count',)
-    list_display = ('name', 'author', 'fav_recipe_count')
-    search_fields = ('name', 'tags')
-    list_filter = ('author', 'name', 'tags')
-    list_per_page = 30
-
-    @admin.display(description='Число добавлений рецепта в избранное')
-    def fav_recipe_count(self, recipe):
-        return recipe.fav_recipes.count()
+    readonly_fields = ('favorites_count', 'in_carts_count')
+    list_display = ('name', 'author', 'favorites_count')
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username__exact')
+    list_filter = (input_filter('author__username', 'автору'), 'tags')
+    autocomplete_fields = ('author',)
+    actions = ('delete_in_background',)
+
+    @admin.action(
+        description='Удалить выбранные рецепты в фоне',
+        permissions=('delete',),
+    )
+    def delete_in_background(self, request, queryset):
+        job = enqueue(
+            'delete_recipes',
+            {'ids': list(queryset.values_list('id', flat=True))},
+            request.user,
+        )
+        self.message_user(
+            request,
+            f'Удаление поставлено в очередь: задача #{job.id}.',
+            messages.SUCCESS,
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change:
+            shopping_totals.rebuild(
+                shopping_totals.get_cart_user_ids(form.instance.id)
+            )
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(ChangeListAdmin):
     search_fields = ('name', 'slug')
     list_filter = ('color',)
-    list_per_page = 30
 
 
 @admin.register(RecipeIngredientAmount)
-class IngredientAmountAdmin(admin.ModelAdmin):
-    search_fields = ('recipe', 'ingredient')
-    list_filter = ('recipe',)
-    list_per_page = 30
+class IngredientAmountAdmin(ChangeListAdmin):
+    list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe__author', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name__exact')
+    list_filter = (input_filter('recipe__id', 'id рецепта'),)
+    autocomplete_fields = ('recipe', 'ingredient')
+    actions = (export_csv,)
+
+    @staticmethod
+    def update_recipes(recipe_ids):
+        """Сбрасывает кеш рецептов и пересчитывает списки покупок."""
+        touch_recipes(Recipe.objects.filter(id__in=recipe_ids))
+        shopping_totals.rebuild(
+            ShoppingCart.objects.filter(recipe_id__in=recipe_ids).values(
+                'user_id'
+            )
+        )
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id, form.initial.get('recipe')}
+        super().save_model(request, obj, form, change)
+        self.update_recipes(recipe_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.update_recipes([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.update_recipes(recipe_ids)
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
-    search_fields = ('user', 'recipe')
-    list_filter = ('user',)
-    list_per_page = 30
+class FavoriteAdmin(ChangeListAdmin):
+    list_display = ('user', 'recipe', 'created')
+    list_select_related = ('user', 'recipe__author')
+    search_fields = ('user__username__exact', 'recipe__name')
+    list_filter = (input_filter('user__username', 'пользователю'),)
+    autocomplete_fields = ('user', 'recipe')
+    actions = (export_csv,)
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    search_fields = ('user', 'recipe')
-    list_filter = ('user',)
-    list_per_page = 30
+class ShoppingCartAdmin(ChangeListAdmin):
+    list_display = ('user', 'recipe', 'created')
+    list_select_related = ('user', 'recipe__author')
+    search_fields = ('user__username__exact', 'recipe__name')
+    list_filter = (input_filter('user__username', 'пользователю'),)
+    autocomplete_fields = ('user', 'recipe')
+    actions = (export_csv,)
+
+
+@admin.register(Job)
+class JobAdmin(ChangeListAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'user', 'created')
+    list_select_related = ('user',)
+    list_filter = ('status', 'kind')
+    readonly_fields = ('created', 'modified')
+    raw_id_fields = ('user',)
@@ -0,0 +1,49 @@
+from django.db import transaction
+
+from . import feed
+from .jobs import enqueue_many
+from .models import DataVersion, Recipe, RecipeIngredientAmount
+
+
+@transaction.atomic
+def create_recipes(entries, batch_size=1000):
+    """Создает рецепты с тегами и ингредиентами несколькими запросами.
+
+    entries — словари в формате validated_data RecipeCreateUpdateSerializer:
+    поля рецепта, tags — список тегов, ingredient — список словарей с id
+    ингредиента и количеством. Пакетная вставка не отправляет сигналы
+    post_save, поэтому версия рецептов, ленты подписчиков и задачи
+    обработки изображений обновляются здесь.
+    """
+    entries = [dict(entry) for entry in entries]
+    if not entries:
+        return []
+    relations = [
+        (entry.pop('tags'), entry.pop('ingredient')) for entry in entries
+    ]
+    recipes = Recipe.objects.bulk_create(
+        [Recipe(**entry) for entry in entries], batch_size=batch_size
+    )
+    recipe_tag = Recipe.tags.through
+    tag_links, amounts = [], []
+    for recipe, (tags, ingredients) in zip(recipes, relations):
+        tag_links.extend(
+            recipe_tag(recipe_id=recipe.id, tag_id=tag.id) for tag in tags
+        )
+        amounts.extend(
+            RecipeIngredientAmount(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount'],
+            )
+            for ingredient in ingredients
+        )
+    recipe_tag.objects.bulk_create(tag_links, batch_size=batch_size)
+    RecipeIngredientAmount.objects.bulk_create(amounts, batch_size=batch_size)
+    enqueue_many(
+        'recipe_image_variants',
+        [{'recipe_id': recipe.id} for recipe in recipes if recipe.image],
+    )
+    feed.fan_out(recipes)
+    DataVersion.bump(DataVersion.RECIPES)
+    return recipes
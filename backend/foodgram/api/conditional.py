@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from .models import DataVersion
+from .viewer import ViewerState
+
+
+def _get_data_version(request, name):
+    versions = getattr(request, '_data_versions', None)
+    if versions is None:
+        versions = request._data_versions = {}
+    if name not in versions:
+        versions[name] = DataVersion.current(name)
+    return versions[name]
+
+
+def popularity_stamp(request):
+    """Отметка времени для списков, отсортированных по популярности.
+
+    Счетчики избранного меняются без смены версии рецептов, поэтому ETag
+    такого списка обновляется раз в RECIPE_POPULARITY_ETAG_INTERVAL
+    секунд, и порядок отстает от счетчиков не дольше этого времени.
+    """
+    if 'favorites_count' not in request.GET.get('ordering', ''):
+        return None
+    return str(int(time.time()) // settings.RECIPE_POPULARITY_ETAG_INTERVAL)
+
+
+def versioned_condition(name, per_viewer=False, stamp=None):
+    """Условный GET по версии набора данных.
+
+    ETag строится из версии данных, а для ответов с флагами пользователя
+    (per_viewer) дополнительно из отпечатка его избранного, списка покупок
+    и подписок. Last-Modified отдается только там, где ответ не зависит
+    от пользователя, иначе If-Modified-Since пропустил бы смену его флагов.
+    stamp — функция от запроса, которая может добавить к ETag отметку
+    данных, не учтенных в версии; тогда Last-Modified не отдается.
+    """
+
+    def get_stamp(request):
+        return stamp(request) if stamp is not None else None
+
+    def etag(request, *args, **kwargs):
+        tag = f'{name}-{_get_data_version(request, name).version}'
+        if per_viewer:
+            tag += f'-{ViewerState.for_request(request).version}'
+        extra = get_stamp(request)
+        if extra is not None:
+            tag += f'-{extra}'
+        return tag
+
+    def last_modified(request, *args, **kwargs):
+        if per_viewer and request.user.is_authenticated:
+            return None
+        if get_stamp(request) is not None:
+            return None
+        return _get_data_version(request, name).modified
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import DataVersion, Favorite, Recipe, ShoppingCart
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def change(model, recipe_id, delta):
+    """Атомарно изменяет счетчик рецепта, не читая его значение.
+
+    Версия рецептов не меняется: иначе отметка одного пользователя
+    сбрасывала бы кеш и ETag списка у всех. Порядок по популярности
+    отстает от счетчиков не дольше RECIPE_POPULARITY_ETAG_INTERVAL, см.
+    conditional.popularity_stamp.
+    """
+    field = COUNTERS[model]
+    recipes = Recipe.objects.filter(id=recipe_id)
+    if delta < 0:
+        recipes = recipes.filter(**{f'{field}__gte': -delta})
+    recipes.update(**{field: F(field) + delta})
+
+
+def _actual_count(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('id'))
+            .order_by()
+            .values('recipe')
+            .annotate(count=Count('id'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def repair():
+    """Пересчитывает разошедшиеся счетчики, возвращает число рецептов."""
+    actual = {field: _actual_count(model) for model, field in COUNTERS.items()}
+    drifted = (
+        Recipe.objects.annotate(
+            **{f'actual_{field}': value for field, value in actual.items()}
+        )
+        .exclude(
+            **{field: F(f'actual_{field}') for field in actual}
+        )
+        .values('id')
+    )
+    repaired = Recipe.objects.filter(id__in=drifted).update(**actual)
+    if repaired:
+        DataVersion.bump(DataVersion.RECIPES)
+    return repaired
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Recipe, RecipeIngredientAmount
+from .serializers import RecipeRetrieveSerializer
+from .viewer import ViewerState, get_viewer_state
+
+
+def with_recipe_relations(queryset):
+    """Загружает автора, теги и ингредиенты рецептов пакетными запросами."""
+    return queryset.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe_ing',
+            queryset=RecipeIngredientAmount.objects.select_related(
+                'ingredient'
+            ).order_by('id'),
+        ),
+    )
+
+
+def recipe_document_key(request, recipe):
+    return (
+        f'recipe-document:{request.scheme}://{request.get_host()}:'
+        f'{recipe.id}:{recipe.modified.timestamp()}'
+    )
+
+
+def _serialize_documents(recipe_ids, request):
+    context = {
+        'request': request,
+        'viewer_state': ViewerState(AnonymousUser()),
+    }
+    recipes = with_recipe_relations(Recipe.objects.filter(id__in=recipe_ids))
+    documents = {
+        recipe_document_key(request, recipe): RecipeRetrieveSerializer(
+            recipe, context=context
+        ).data
+        for recipe in recipes
+    }
+    cache.set_many(documents, settings.RECIPE_DOCUMENT_TIMEOUT)
+    return documents
+
+
+def _apply_viewer_state(document, viewer_state, image_variant):
+    recipe_id, author_id = document['id'], document['author']['id']
+    return {
+        **document,
+        'image': document['images'][image_variant],
+        'author': {
+            **document['author'],
+            'is_subscribed': author_id in viewer_state.subscribed_ids,
+        },
+        'is_favorited': recipe_id in viewer_state.favorite_ids,
+        'is_in_shopping_cart': recipe_id in viewer_state.cart_ids,
+    }
+
+
+def get_recipe_documents(recipes, context, image_variant='detail'):
+    """Возвращает представления рецептов из кеша.
+
+    Закешированный документ общий для всех пользователей и хранится под
+    ключом с датой изменения рецепта, поэтому любое изменение рецепта
+    делает старый документ недоступным. Отсутствующие в кеше документы
+    сериализуются одним пакетом, а флаги текущего пользователя
+    подставляются при каждом ответе. image_variant выбирает копию
+    изображения для поля image.
+    """
+    request = context['request']
+    keys = [recipe_document_key(request, recipe) for recipe in recipes]
+    documents = cache.get_many(keys)
+    missing = [
+        recipe.id for recipe, key in zip(recipes, keys) if key not in documents
+    ]
+    fresh = {}
+    if missing:
+        fresh = {
+            document['id']: document
+            for document in _serialize_documents(missing, request).values()
+        }
+    viewer_state = get_viewer_state(context)
+    result = []
+    for recipe, key in zip(recipes, keys):
+        document = documents.get(key) or fresh.get(recipe.id)
+        if document is not None:
+            result.append(
+                _apply_viewer_state(document, viewer_state, image_variant)
+            )
+    return result
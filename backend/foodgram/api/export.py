@@ -0,0 +1,87 @@
+import csv
+import io
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from users.models import Subscription
+
+from .models import Favorite, RecipeIngredientAmount, ShoppingCart
+
+EXPORT_FIELDS = {
+    Favorite: (
+        'id',
+        'user_id',
+        'user__username',
+        'recipe_id',
+        'recipe__name',
+        'created',
+    ),
+    ShoppingCart: (
+        'id',
+        'user_id',
+        'user__username',
+        'recipe_id',
+        'recipe__name',
+        'created',
+    ),
+    Subscription: (
+        'id',
+        'user_id',
+        'user__username',
+        'author_id',
+        'author__username',
+    ),
+    RecipeIngredientAmount: (
+        'id',
+        'recipe_id',
+        'recipe__name',
+        'ingredient_id',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount',
+    ),
+}
+
+EXPORT_MODELS = {model._meta.model_name: model for model in EXPORT_FIELDS}
+
+
+def render_csv(queryset, chunk_size=None):
+    """Формирует CSV выгрузку по частям.
+
+    Строки читаются курсором на сервере БД порциями по chunk_size,
+    связанные имена подставляются соединениями в том же запросе, поэтому
+    расход памяти не зависит от размера таблицы.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    fields = EXPORT_FIELDS[queryset.model]
+    rows = (
+        queryset.order_by('pk')
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def get_filename(model):
+    return f'{model._meta.model_name}_{timezone.now():%Y%m%d_%H%M%S}.csv'
+
+
+def export_response(queryset):
+    response = StreamingHttpResponse(
+        render_csv(queryset), content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = content_disposition_header(
+        True, get_filename(queryset.model)
+    )
+    return response
@@ -0,0 +1,54 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from users.models import Subscription
+
+from .models import FeedEntry, Recipe
+
+
+def _create_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries, ignore_conflicts=True, batch_size=settings.FEED_BATCH_SIZE
+    )
+
+
+def fan_out(recipes):
+    """Добавляет новые рецепты в ленты подписчиков их авторов."""
+    followers = defaultdict(list)
+    for user_id, author_id in Subscription.objects.filter(
+        author_id__in={recipe.author_id for recipe in recipes}
+    ).values_list('user_id', 'author_id'):
+        followers[author_id].append(user_id)
+    _create_entries(
+        FeedEntry(
+            user_id=user_id, recipe_id=recipe.id, author_id=recipe.author_id
+        )
+        for recipe in recipes
+        for user_id in followers[recipe.author_id]
+    )
+
+
+def follow(user_id, author_id):
+    """Добавляет в ленту пользователя все рецепты автора."""
+    _create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+        for recipe_id in Recipe.objects.filter(author_id=author_id)
+        .order_by()
+        .values_list('id', flat=True)
+        .iterator()
+    )
+
+
+def unfollow(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+@transaction.atomic
+def rebuild(user_ids):
+    """Собирает ленты пользователей заново по их подпискам."""
+    FeedEntry.objects.filter(user_id__in=user_ids).delete()
+    for user_id, author_id in Subscription.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'author_id'):
+        follow(user_id, author_id)
@@ -1,18 +1,48 @@
 import django_filters
-from rest_framework.filters import SearchFilter
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from rest_framework import serializers
+from rest_framework.filters import OrderingFilter
 
-from .models import Ingredient, Recipe, Tag
+from .models import Recipe, Tag
 
 
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
+def get_query_param(request, name, field, default=None):
+    """Проверяет параметр запроса полем сериализатора, иначе ошибка 400."""
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        return field.run_validation(value)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({name: error.detail})
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+
+def get_positive_int_param(request, name, default=None):
+    return get_query_param(
+        request, name, serializers.IntegerField(min_value=1), default
+    )
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Сортировка по параметру ordering с id для однозначного порядка.
+
+    Без параметра порядок не меняется, например остается сортировка
+    поиска по релевантности.
+    """
+
+    def get_default_ordering(self, view):
+        return None
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or {'id', '-id'} & set(ordering):
+            return ordering
+        return [*ordering, '-id']
 
 
 class RecipeFilter(django_filters.FilterSet):
+    name = django_filters.CharFilter(method='filter_name')
     is_favorited = django_filters.BooleanFilter(
         widget=django_filters.widgets.BooleanWidget()
     )
@@ -28,4 +58,25 @@ class RecipeFilter(django_filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = (
+            'is_favorited',
+            'is_in_shopping_cart',
+            'author',
+            'tags',
+            'name',
+        )
+
+    def filter_name(self, queryset, name, value):
+        """Поиск по вхождению и сходству слов с сортировкой по релевантности.
+
+        Сходство слов обслуживает триграммный индекс recipe_name_trgm, а
+        поиск вхождения без учета регистра, который сравнивает UPPER(name),
+        — индекс того же выражения recipe_name_upper_trgm.
+        """
+        return (
+            queryset.filter(
+                Q(name__icontains=value) | Q(name__trigram_word_similar=value)
+            )
+            .annotate(similarity=TrigramWordSimilarity(value, 'name'))
+            .order_by('-similarity', '-id')
+        )
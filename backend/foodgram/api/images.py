@@ -0,0 +1,112 @@
+import io
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import DataVersion, Recipe
+from .storage import image_storage
+
+
+def _encode(image, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _resized(image, size):
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    return copy
+
+
+def get_referenced_files(names):
+    """Файлы из names, которые используются хотя бы одним рецептом."""
+    lookups = Q(image__in=names)
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        lookups |= Q(**{f'image_variants__{variant}__in': names})
+    referenced = set()
+    for image, variants in Recipe.objects.filter(lookups).values_list(
+        'image', 'image_variants'
+    ):
+        referenced.update((image, *variants.values()))
+    return referenced & set(names)
+
+
+def release_image_files(names):
+    """Удаляет файлы, на которые больше не ссылается ни один рецепт.
+
+    Хранилище изображений общее для одинаковых файлов, поэтому просто
+    удалить файл рецепта нельзя: он может быть нужен другим рецептам.
+    Файлы, записанные за последние RECIPE_IMAGE_RELEASE_DELAY секунд,
+    не удаляются: их может использовать рецепт, транзакция которого еще
+    не завершилась. Возвращает удаленные и отложенные файлы.
+    """
+    names = set(names)
+    if not names:
+        return [], []
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.RECIPE_IMAGE_RELEASE_DELAY
+    )
+    deleted, postponed = [], []
+    for name in sorted(names - get_referenced_files(names)):
+        if (
+            image_storage.exists(name)
+            and image_storage.get_modified_time(name) > cutoff
+        ):
+            postponed.append(name)
+            continue
+        image_storage.delete(name)
+        deleted.append(name)
+    return deleted, postponed
+
+
+def process_recipe_image(recipe_id):
+    """Ограничивает размер оригинала и создает уменьшенные копии.
+
+    Копии сохраняются в RECIPE_IMAGE_FORMAT рядом с оригиналом. Если пока
+    шла обработка, изображение рецепта сменили, результат не записывается.
+    Возвращает копии и файлы, которые больше не нужны рецепту. Если
+    рецепт успели удалить, обрабатывать нечего.
+    """
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None:
+        return {}, set()
+    original = recipe.image
+    storage = original.storage
+    old_files = recipe.get_image_files()
+    with original.open('rb') as file:
+        image = Image.open(file)
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    base, extension = os.path.splitext(original.name)
+    image_name = original.name
+    max_side = settings.RECIPE_IMAGE_MAX_SIDE
+    if max(image.size) > max_side:
+        image = _resized(image, (max_side, max_side))
+        image_name = storage.save(
+            f'{base}{extension}', _encode(image, image_format)
+        )
+    variant_format = settings.RECIPE_IMAGE_FORMAT
+    variants = {
+        name: storage.save(
+            f'{base}_{name}.{variant_format.lower()}',
+            _encode(_resized(image, size), variant_format, quality=80),
+        )
+        for name, size in settings.RECIPE_IMAGE_VARIANTS.items()
+    }
+    updated = Recipe.objects.filter(
+        id=recipe_id, image=original.name
+    ).update(
+        image=image_name, image_variants=variants, modified=timezone.now()
+    )
+    if not updated:
+        return {}, {image_name, *variants.values()}
+    DataVersion.bump(DataVersion.RECIPES)
+    return variants, old_files - {image_name, *variants.values()}
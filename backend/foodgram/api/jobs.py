@@ -0,0 +1,182 @@
+import logging
+import os
+import posixpath
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .images import process_recipe_image, release_image_files
+from .models import Job, Recipe
+from .shopping_list import RENDERERS, get_filename, get_shopping_list
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def job_handler(kind):
+    """Регистрирует функцию, выполняющую задачи указанного типа."""
+
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def _check_kind(kind):
+    if kind not in HANDLERS:
+        raise ValueError(f'Неизвестный тип задачи: {kind}')
+
+
+def enqueue(kind, payload=None, user=None, run_after=None):
+    _check_kind(kind)
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        user=user,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def enqueue_many(kind, payloads, user=None):
+    """Ставит в очередь задачи одного типа одним запросом."""
+    _check_kind(kind)
+    return Job.objects.bulk_create(
+        Job(kind=kind, payload=payload, user=user) for payload in payloads
+    )
+
+
+def claim_job():
+    """Забирает из очереди одну готовую к запуску задачу.
+
+    Задача блокируется с SKIP LOCKED, поэтому несколько воркеров не
+    получат одну и ту же. На время выполнения run_after сдвигается на
+    JOB_LEASE_TIMEOUT: если воркер упадет, задача вернется в очередь.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=(Job.PENDING, Job.RUNNING), run_after__lte=now
+            )
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.run_after = now + timedelta(seconds=settings.JOB_LEASE_TIMEOUT)
+        job.save(update_fields=('status', 'attempts', 'run_after', 'modified'))
+    return job
+
+
+def prune_jobs():
+    """Удаляет завершенные задачи старше JOB_RETENTION_DAYS дней."""
+    return Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        modified__lt=timezone.now()
+        - timedelta(days=settings.JOB_RETENTION_DAYS),
+    ).delete()[0]
+
+
+def run_job(job):
+    try:
+        if job.attempts > job.max_attempts:
+            raise RuntimeError('Превышено число попыток')
+        job.result = HANDLERS[job.kind](job)
+    except Exception as error:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        job.error = f'{type(error).__name__}: {error}'
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.DONE
+        job.error = ''
+    job.save()
+    return job
+
+
+@job_handler('shopping_list')
+def render_shopping_list(job):
+    file_format = job.payload['file_format']
+    content = b''.join(
+        RENDERERS[file_format].render(
+            job.user, get_shopping_list(job.user), timezone.now().date()
+        )
+    )
+    name = default_storage.save(
+        f'shopping_lists/{uuid.uuid4().hex}/'
+        f'{get_filename(job.user, file_format)}',
+        ContentFile(content),
+    )
+    expires = timezone.now() + timedelta(
+        seconds=settings.SHOPPING_LIST_FILE_TIMEOUT
+    )
+    enqueue('delete_file', {'name': name}, run_after=expires)
+    return {'file': default_storage.url(name), 'expires': expires.isoformat()}
+
+
+@job_handler('delete_file')
+def delete_file(job):
+    """Удаляет устаревший файл и ставшую пустой папку с ним."""
+    name = job.payload['name']
+    default_storage.delete(name)
+    try:
+        os.rmdir(default_storage.path(posixpath.dirname(name)))
+    except (NotImplementedError, OSError):
+        pass
+    return {'deleted': name}
+
+
+@job_handler('delete_recipes')
+def delete_recipes(job):
+    ids = job.payload['ids']
+    deleted = 0
+    for start in range(0, len(ids), settings.JOB_DELETE_BATCH_SIZE):
+        with transaction.atomic():
+            deleted += Recipe.objects.filter(
+                id__in=ids[start:start + settings.JOB_DELETE_BATCH_SIZE]
+            ).delete()[1].get(Recipe._meta.label, 0)
+    return {'deleted': deleted}
+
+
+def schedule_image_release(names):
+    """Ставит в очередь удаление файлов изображений с задержкой.
+
+    За это время успевают завершиться транзакции рецептов, которые
+    загрузили те же файлы.
+    """
+    if names:
+        enqueue(
+            'release_image_files',
+            {'names': sorted(names)},
+            run_after=timezone.now()
+            + timedelta(seconds=settings.RECIPE_IMAGE_RELEASE_DELAY),
+        )
+
+
+@job_handler('recipe_image_variants')
+def generate_image_variants(job):
+    variants, unused = process_recipe_image(job.payload['recipe_id'])
+    schedule_image_release(unused)
+    return variants
+
+
+@job_handler('release_image_files')
+def delete_unused_image_files(job):
+    deleted, postponed = release_image_files(job.payload['names'])
+    schedule_image_release(postponed)
+    return {'deleted': deleted, 'postponed': postponed}
@@ -0,0 +1,41 @@
+import sys
+
+from api.export import EXPORT_MODELS, render_csv
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает избранное, списки покупок, подписки или ингредиенты '
+        'рецептов в CSV, читая таблицу порциями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(EXPORT_MODELS))
+        parser.add_argument(
+            '--output', default='-', help='Файл CSV или - для stdout'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        chunks = render_csv(
+            EXPORT_MODELS[options['model']].objects.all(),
+            options['chunk_size'],
+        )
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        try:
+            with open(options['output'], 'wb') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+        except OSError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            self.style.SUCCESS(f'Выгрузка сохранена в {options["output"]}.')
+        )
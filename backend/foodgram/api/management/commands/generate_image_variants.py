@@ -0,0 +1,26 @@
+from api.jobs import enqueue
+from api.models import Recipe
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь создание копий изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии и для рецептов, у которых они уже есть',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        count = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            enqueue('recipe_image_variants', {'recipe_id': recipe_id})
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Поставлено в очередь задач: {count}.')
+        )
@@ -0,0 +1,188 @@
+import json
+import os
+import sys
+import time
+
+from api.bulk import create_recipes
+from api.models import Recipe
+from api.reference import (
+    ingredient_reference,
+    normalize_name,
+    tag_reference,
+)
+from django.core.files import File
+from django.core.management import BaseCommand, CommandError
+from foodgram.settings import MIN_VALUE
+from users.models import User
+
+NAME_LENGTH = Recipe._meta.get_field('name').max_length
+
+
+class RecordError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует рецепты из файла NDJSON: по одному JSON объекту с '
+        'полями author, name, text, cooking_time, image, tags и ingredients '
+        'на строке. Рецепты, которые у автора уже есть, пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON или - для stdin')
+        parser.add_argument(
+            '--images-dir',
+            default='.',
+            help='Папка, относительно которой указаны пути изображений',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.images_dir = options['images_dir']
+        self.images = {}
+        self.tags = {
+            tag.slug: tag for tag in tag_reference.get().objects.values()
+        }
+        self.ingredients = {
+            (normalize_name(ingredient.name), ingredient.measurement_unit): (
+                ingredient.id
+            )
+            for ingredient in ingredient_reference.get().objects.values()
+        }
+        self.created = self.skipped = self.failed = 0
+        started = time.monotonic()
+        if options['path'] == '-':
+            self.import_lines(sys.stdin, options['batch_size'])
+        else:
+            try:
+                with open(options['path'], encoding='utf-8') as file:
+                    self.import_lines(file, options['batch_size'])
+            except OSError as error:
+                raise CommandError(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Создано: {self.created}, пропущено: {self.skipped}, '
+                f'с ошибками: {self.failed} '
+                f'за {time.monotonic() - started:.1f} с.'
+            )
+        )
+
+    def import_lines(self, lines, batch_size):
+        batch = []
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                batch.append((line_number, self.parse_record(line)))
+            except RecordError as error:
+                self.report_error(line_number, error)
+            if len(batch) >= batch_size:
+                self.import_batch(batch)
+                batch = []
+        self.import_batch(batch)
+
+    def report_error(self, line_number, error):
+        self.failed += 1
+        self.stderr.write(f'Строка {line_number}: {error}')
+
+    def parse_record(self, line):
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise RecordError(f'некорректный JSON: {error}')
+        try:
+            return self.build_entry(record)
+        except KeyError as error:
+            raise RecordError(f'не заполнено поле {error}')
+        except (AttributeError, TypeError):
+            raise RecordError('некорректный формат записи')
+
+    def build_entry(self, record):
+        tags = []
+        for slug in record['tags']:
+            if slug not in self.tags:
+                raise RecordError(f'неизвестный тег {slug}')
+            tags.append(self.tags[slug])
+        ingredients = {}
+        for item in record['ingredients']:
+            key = (normalize_name(item['name']), item['measurement_unit'])
+            if key not in self.ingredients:
+                raise RecordError(f'неизвестный ингредиент {key}')
+            if item['amount'] < MIN_VALUE:
+                raise RecordError(f'количество {key} меньше {MIN_VALUE}')
+            ingredients[self.ingredients[key]] = item['amount']
+        if not tags or not ingredients:
+            raise RecordError('у рецепта должны быть теги и ингредиенты')
+        if not 0 < len(record['name']) <= NAME_LENGTH:
+            raise RecordError('некорректная длина названия')
+        if record['cooking_time'] < MIN_VALUE:
+            raise RecordError(f'время приготовления меньше {MIN_VALUE}')
+        return {
+            'author': record['author'],
+            'name': record['name'],
+            'text': record['text'],
+            'cooking_time': record['cooking_time'],
+            'image': record['image'],
+            'tags': tags,
+            'ingredient': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount in ingredients.items()
+            ],
+        }
+
+    def save_image(self, path):
+        if path not in self.images:
+            image_field = Recipe._meta.get_field('image')
+            with open(os.path.join(self.images_dir, path), 'rb') as file:
+                self.images[path] = image_field.storage.save(
+                    image_field.generate_filename(
+                        None, os.path.basename(path)
+                    ),
+                    File(file),
+                )
+        return self.images[path]
+
+    def import_batch(self, batch):
+        if not batch:
+            return
+        authors = {
+            user.username: user
+            for user in User.objects.filter(
+                username__in={entry['author'] for _, entry in batch}
+            )
+        }
+        existing = set(
+            Recipe.objects.filter(
+                author__in=authors.values(),
+                name__in={entry['name'] for _, entry in batch},
+            ).values_list('author__username', 'name')
+        )
+        entries = []
+        for line_number, entry in batch:
+            key = (entry['author'], entry['name'])
+            if entry['author'] not in authors:
+                self.report_error(
+                    line_number, f'неизвестный автор {entry["author"]}'
+                )
+                continue
+            if key in existing:
+                self.skipped += 1
+                continue
+            try:
+                entry['image'] = self.save_image(entry['image'])
+            except OSError as error:
+                self.report_error(line_number, error)
+                continue
+            # Имя файла в хранилище состоит из хеша его содержимого.
+            entry['image_hash'] = os.path.splitext(
+                os.path.basename(entry['image'])
+            )[0]
+            existing.add(key)
+            entry['author'] = authors[entry['author']]
+            entries.append(entry)
+        self.created += len(create_recipes(entries))
+        self.stdout.write(
+            f'Создано {self.created}, пропущено {self.skipped}, '
+            f'ошибок {self.failed}'
+        )
@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+
+from api.models import DataVersion, Ingredient
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from foodgram.settings import BASE_DIR
+
+FORMATS = ('csv', 'json')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1] if len(row) > 1 else ''
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield item.get('name', ''), item.get('measurement_unit', '')
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV или JSON файлов. Уже существующие '
+        'ингредиенты пропускаются, поэтому команду можно запускать повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            default=[os.path.join(BASE_DIR, 'data/ingredients.csv')],
+            help='Файлы с ингредиентами, по умолчанию data/ingredients.csv',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файлов, по умолчанию определяется по расширению',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def read_rows(self, path, file_format):
+        file_format = file_format or os.path.splitext(path)[1][1:].lower()
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла {path}, укажите --format'
+            )
+        try:
+            with open(path, encoding='utf-8') as file:
+                return list(READERS[file_format](file))
+        except (OSError, ValueError, AttributeError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+
+    def handle(self, *args, **options):
+        name_length = Ingredient._meta.get_field('name').max_length
+        unit_length = Ingredient._meta.get_field(
+            'measurement_unit'
+        ).max_length
+        rows = set()
+        invalid = 0
+        for path in options['paths']:
+            for name, measurement_unit in self.read_rows(
+                path, options['format']
+            ):
+                name, measurement_unit = name.strip(), measurement_unit.strip()
+                if (
+                    not name
+                    or not measurement_unit
+                    or len(name) > name_length
+                    or len(measurement_unit) > unit_length
+                ):
+                    invalid += 1
+                    continue
+                rows.add((name, measurement_unit))
+        rows = sorted(rows)
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            existing = Ingredient.objects.count()
+            for start in range(0, len(rows), batch_size):
+                Ingredient.objects.bulk_create(
+                    [
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in rows[start:start + batch_size]
+                    ],
+                    ignore_conflicts=True,
+                )
+                self.stdout.write(
+                    f'Обработано {min(start + batch_size, len(rows))} '
+                    f'из {len(rows)}'
+                )
+            inserted = Ingredient.objects.count() - existing
+            if inserted:
+                DataVersion.bump(DataVersion.INGREDIENTS)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Добавлено: {inserted}, пропущено: {len(rows) - inserted}, '
+                f'с ошибками: {invalid}.'
+            )
+        )
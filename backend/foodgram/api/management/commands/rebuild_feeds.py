@@ -0,0 +1,11 @@
+from api import feed
+from django.core.management import BaseCommand
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты рецептов по подпискам пользователей'
+
+    def handle(self, *args, **options):
+        feed.rebuild(User.objects.values('id'))
+        self.stdout.write(self.style.SUCCESS('Ленты пересобраны.'))
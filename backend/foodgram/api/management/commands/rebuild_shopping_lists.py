@@ -0,0 +1,11 @@
+from api import shopping_totals
+from django.core.management import BaseCommand
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводные списки покупок по корзинам пользователей'
+
+    def handle(self, *args, **options):
+        shopping_totals.rebuild(User.objects.values('id'))
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересчитаны.'))
@@ -0,0 +1,12 @@
+from api import counters
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики избранного и списков покупок рецептов'
+
+    def handle(self, *args, **options):
+        repaired = counters.repair()
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлены счетчики рецептов: {repaired}.')
+        )
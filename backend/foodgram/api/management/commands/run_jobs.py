@@ -0,0 +1,39 @@
+import time
+
+from api.jobs import claim_job, prune_jobs, run_job
+from django.conf import settings
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи из фоновой очереди и периодически удаляет '
+        'старые завершенные задачи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+
+    def prune(self):
+        pruned = prune_jobs()
+        if pruned:
+            self.stdout.write(f'Удалено завершенных задач: {pruned}')
+        self.next_prune = time.monotonic() + settings.JOB_PRUNE_INTERVAL
+
+    def handle(self, *args, **options):
+        self.prune()
+        while True:
+            if time.monotonic() >= self.next_prune:
+                self.prune()
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(settings.JOB_POLL_INTERVAL)
+                continue
+            run_job(job)
+            self.stdout.write(f'{job}')
@@ -0,0 +1,15 @@
+from api import trending
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг популярных рецептов. '
+        'Запускается по расписанию, например раз в час.'
+    )
+
+    def handle(self, *args, **options):
+        count = trending.update()
+        self.stdout.write(
+            self.style.SUCCESS(f'Рецептов в рейтинге: {count}.')
+        )
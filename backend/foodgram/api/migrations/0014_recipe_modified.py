@@ -0,0 +1,20 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_alter_recipeingredientamount_amount"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="modified",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Дата изменения"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:47
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_dataversion"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"], name="recipe_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:54
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_recipe_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="image",
+            field=models.ImageField(
+                storage=api.storage.ContentAddressedStorage(),
+                upload_to="media/",
+                verbose_name="Изображение",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.1 on 2026-10-18 17:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_recipe_rows(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef("id"))
+            .order_by()
+            .values("recipe")
+            .annotate(count=Count("id"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("api", "Recipe")
+    Recipe.objects.update(
+        favorites_count=count_recipe_rows(apps.get_model("api", "Favorite")),
+        in_carts_count=count_recipe_rows(
+            apps.get_model("api", "ShoppingCart")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0021_feedentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Число добавлений в избранное"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="in_carts_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Число добавлений в список покупок",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-favorites_count", "-id"], name="recipe_popularity_idx"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
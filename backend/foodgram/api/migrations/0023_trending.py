@@ -0,0 +1,72 @@
+# Generated by Django 4.2.1 on 2026-10-18 17:05
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backdate_existing(apps, schema_editor):
+    """Относит добавления, сделанные до появления даты, за окно рейтинга.
+
+    Иначе все они получили бы дату миграции и первые дни считались бы
+    свежей активностью в полном весе.
+    """
+    created = django.utils.timezone.now() - timedelta(
+        days=settings.TRENDING_WINDOW_DAYS
+    )
+    for model_name in ("Favorite", "ShoppingCart"):
+        apps.get_model("api", model_name).objects.update(created=created)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0022_recipe_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingRecipe",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="trending",
+                        serialize=False,
+                        to="api.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Рейтинг")),
+            ],
+            options={
+                "verbose_name": "Популярный рецепт",
+                "verbose_name_plural": "Популярные рецепты",
+                "ordering": ("-score", "-recipe"),
+            },
+        ),
+        migrations.AddField(
+            model_name="favorite",
+            name="created",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата добавления",
+            ),
+        ),
+        migrations.AddField(
+            model_name="shoppingcart",
+            name="created",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата добавления",
+            ),
+        ),
+        migrations.RunPython(backdate_existing, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,15 @@
 from colorfield.fields import ColorField
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Upper
+from django.utils import timezone
 from foodgram.settings import MIN_VALUE
 from users.models import User
 
+from .storage import image_storage
+
 
 class Ingredient(models.Model):
     name = models.CharField('Название', max_length=200)
@@ -45,7 +51,18 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField('Название', max_length=200)
-    image = models.ImageField('Изображение', upload_to='media/')
+    image = models.ImageField(
+        'Изображение', upload_to='media/', storage=image_storage
+    )
+    image_variants = models.JSONField(
+        'Уменьшенные копии изображения', default=dict, blank=True
+    )
+    image_hash = models.CharField(
+        'Хеш загруженного изображения',
+        max_length=64,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField('Описание')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -66,15 +83,47 @@ class Recipe(models.Model):
             )
         ],
     )
+    modified = models.DateTimeField(
+        'Дата изменения', auto_now=True, db_index=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Число добавлений в избранное', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Число добавлений в список покупок', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-id',)
+        indexes = [
+            GinIndex(
+                fields=['name'],
+                name='recipe_name_trgm',
+                opclasses=['gin_trgm_ops'],
+            ),
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='recipe_name_upper_trgm',
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popularity_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.name[:30]} ({self.author.username[:30]})'
 
+    def get_image_name(self, variant):
+        """Файл уменьшенной копии, а пока ее нет — оригинал."""
+        return self.image_variants.get(variant, self.image.name)
+
+    def get_image_files(self):
+        """Все файлы изображения рецепта: оригинал и его копии."""
+        return {self.image.name, *self.image_variants.values()} - {''}
+
 
 class RecipeIngredientAmount(models.Model):
     recipe = models.ForeignKey(
@@ -122,6 +171,9 @@ class Favorite(models.Model):
         related_name='fav_recipes',
         on_delete=models.CASCADE,
     )
+    created = models.DateTimeField(
+        'Дата добавления', default=timezone.now, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Список избранного'
@@ -152,6 +204,9 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         on_delete=models.CASCADE,
     )
+    created = models.DateTimeField(
+        'Дата добавления', default=timezone.now, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -167,3 +222,173 @@ class ShoppingCart(models.Model):
             f'{self.user.username[:30]} добавил в список покупок'
             f' {self.recipe.name[:30]}'
         )
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+        on_delete=models.CASCADE,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        related_name='shopping_list',
+        on_delete=models.CASCADE,
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'], name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.user.username[:30]}: {self.ingredient.name[:30]}'
+            f' {self.amount}'
+        )
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте пользователя, подписанного на его автора."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='feed',
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-recipe',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'author'], name='feed_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username[:30]}: {self.recipe_id}'
+
+
+class TrendingRecipe(models.Model):
+    """Рецепт из рейтинга популярных, пересчитываемого по расписанию."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='trending',
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+    score = models.FloatField('Рейтинг')
+
+    class Meta:
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+        ordering = ('-score', '-recipe')
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score:.2f}'
+
+
+class DataVersion(models.Model):
+    """Версия набора данных для валидации кешей и условных запросов."""
+
+    RECIPES = 'recipes'
+    TAGS = 'tags'
+    INGREDIENTS = 'ingredients'
+
+    name = models.CharField('Название', max_length=50, unique=True)
+    version = models.PositiveBigIntegerField('Версия', default=0)
+    modified = models.DateTimeField('Дата изменения', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.get_or_create(name=name)[0]
+
+    @classmethod
+    def bump(cls, name):
+        if not cls.objects.filter(name=name).update(
+            version=F('version') + 1, modified=timezone.now()
+        ):
+            cls.objects.get_or_create(name=name)
+
+
+class Job(models.Model):
+    """Задача фоновой очереди, которую выполняет команда run_jobs."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    kind = models.CharField('Тип', max_length=50)
+    payload = models.JSONField('Параметры', default=dict)
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='jobs',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток', default=3
+    )
+    run_after = models.DateTimeField('Запустить после', default=timezone.now)
+    result = models.JSONField('Результат', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+    modified = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('-id',)
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.id} ({self.get_status_display()})'
@@ -1,5 +1,113 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class EstimatedCountPaginator(Paginator):
+    """Берет число строк большой таблицы из статистики PostgreSQL.
+
+    Оценка используется только для выборки без условий, когда в таблице
+    больше estimate_threshold строк. Для остальных считается точно.
+    """
+
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[getattr(queryset, 'db', 'default')]
+        query = getattr(queryset, 'query', None)
+        if (
+            query is None
+            or query.where
+            or query.distinct
+            or connection.vendor != 'postgresql'
+        ):
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < self.estimate_threshold:
+            return super().count
+        return int(row[0])
+
+
+class CachedCountPaginator(EstimatedCountPaginator):
+    """Запоминает общее количество объектов для набора фильтров.
+
+    Подсчет кешируется на PAGINATION_COUNT_TIMEOUT секунд по тексту
+    запроса без сортировки и аннотаций, не участвующих в условиях, поэтому
+    выборка с одними и теми же фильтрами считается один раз для всех
+    пользователей, а не отдельно из-за их флагов избранного. Для выборки
+    без условий используется оценка EstimatedCountPaginator.
+    """
+
+    @cached_property
+    def count(self):
+        try:
+            query = str(self.object_list.order_by().values('pk').query)
+        except (AttributeError, EmptyResultSet):
+            return super().count
+        key = f'count:{hashlib.md5(query.encode()).hexdigest()}'
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.PAGINATION_COUNT_TIMEOUT)
+        return count
 
 
 class PageNumberLimitPagination(PageNumberPagination):
+    django_paginator_class = CachedCountPaginator
+    page_size_query_param = 'limit'
+
+
+class CursorLimitPagination(CursorPagination):
     page_size_query_param = 'limit'
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        """Порядок из фильтра сортировки, если он задан в запросе."""
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return tuple(ordering)
+        return (self.ordering,)
+
+
+class PageNumberOrCursorPagination(PageNumberLimitPagination):
+    """Постраничная пагинация с курсорным режимом по запросу.
+
+    Если в запросе передан параметр ``cursor`` (для первой страницы —
+    пустой), выдача упорядочивается по убыванию id и разбивается на
+    страницы по ключу без OFFSET и подсчета общего количества.
+    """
+
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = CursorLimitPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class FeedPagination(CursorLimitPagination):
+    ordering = '-recipe_id'
@@ -0,0 +1,30 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """Разбирает multipart/form-data с вложенными полями в виде JSON.
+
+    Файлы Django пишет во временные файлы по частям, не загружая их
+    целиком в память. Поля из json_form_fields представления, например
+    список ингредиентов, передаются строкой JSON и декодируются здесь.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        view = (parser_context or {}).get('view')
+        json_fields = getattr(view, 'json_form_fields', ())
+        data = {}
+        for key, values in parsed.data.lists():
+            if key in json_fields:
+                try:
+                    data[key] = json.loads(values[-1])
+                except ValueError as error:
+                    raise ParseError(
+                        f'Поле {key} должно содержать JSON: {error}'
+                    )
+            else:
+                data[key] = values[-1] if len(values) == 1 else values
+        return DataAndFiles(data, dict(parsed.files.items()))
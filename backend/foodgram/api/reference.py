@@ -0,0 +1,155 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+
+from .models import DataVersion, Ingredient, Tag
+
+FUZZY_MIN_LENGTH = 3
+SIMILARITY_THRESHOLD = 0.5
+
+
+def normalize_name(name):
+    return name.strip().casefold().replace('ё', 'е')
+
+
+def render_rows(rows):
+    return b'[' + b','.join(rows) + b']'
+
+
+def get_trigrams(text):
+    """Триграммы слов по правилам pg_trgm."""
+    trigrams = set()
+    for word in re.findall(r'\w+', text):
+        padded = f'  {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+class NameIndex:
+    """Индекс названий для автодополнения и нечеткого поиска.
+
+    Сначала возвращаются названия, начинающиеся с запроса, в алфавитном
+    порядке. За ними идут названия, содержащие запрос или похожие на него
+    по триграммам, по убыванию сходства. Кандидаты для нечеткого поиска
+    берутся из обратного индекса триграмм, а не перебором всех названий.
+    """
+
+    def __init__(self, names, rows):
+        pairs = sorted(
+            zip(map(normalize_name, names), rows), key=lambda pair: pair[0]
+        )
+        self.keys = [key for key, _ in pairs]
+        self.rows = [row for _, row in pairs]
+        self.postings = defaultdict(list)
+        for position, key in enumerate(self.keys):
+            for trigram in get_trigrams(key):
+                self.postings[trigram].append(position)
+
+    def _prefix_positions(self, query):
+        positions = []
+        for position in range(bisect_left(self.keys, query), len(self.keys)):
+            if not self.keys[position].startswith(query):
+                break
+            positions.append(position)
+        return positions
+
+    def _fuzzy_positions(self, query):
+        query_trigrams = get_trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.postings.get(trigram, ()))
+        scored = []
+        for position, count in shared.items():
+            key = self.keys[position]
+            score = 1 if query in key else count / len(query_trigrams)
+            if score >= SIMILARITY_THRESHOLD:
+                scored.append((-score, len(key), position))
+        return [position for *_, position in sorted(scored)]
+
+    def search(self, query, limit=None):
+        query = normalize_name(query)
+        positions = self._prefix_positions(query)
+        if len(query) >= FUZZY_MIN_LENGTH:
+            found = set(positions)
+            positions.extend(
+                position
+                for position in self._fuzzy_positions(query)
+                if position not in found
+            )
+        return [self.rows[position] for position in positions[:limit]]
+
+
+class ReferenceData:
+    def __init__(self, version, objects, rows):
+        self.version = version
+        self.objects = {obj.id: obj for obj in objects}
+        self.names = [obj.name for obj in objects]
+        self.rows = rows
+
+    @cached_property
+    def content(self):
+        return render_rows(self.rows)
+
+    @cached_property
+    def name_index(self):
+        return NameIndex(self.names, self.rows)
+
+
+class ReferenceCache:
+    """Справочник, целиком хранящийся в памяти процесса.
+
+    Держит словарь id -> объект для валидации, готовый JSON каждой записи
+    и индекс названий для поиска. Перед каждым использованием
+    сверяется с общей версией в DataVersion, поэтому изменение справочника
+    в одном воркере замечают все остальные.
+    """
+
+    def __init__(self, version_name, queryset, serializer_path):
+        self.version_name = version_name
+        self.queryset = queryset
+        self.serializer_path = serializer_path
+        self._data = None
+
+    def get(self):
+        version = DataVersion.current(self.version_name).version
+        if self._data is None or self._data.version != version:
+            self._data = self._load(version)
+        return self._data
+
+    def for_request(self, request):
+        """Справочник, сверенный с версией один раз за запрос."""
+        if request is None:
+            return self.get()
+        pinned = getattr(request, '_reference_data', None)
+        if pinned is None:
+            pinned = request._reference_data = {}
+        if self.version_name not in pinned:
+            pinned[self.version_name] = self.get()
+        return pinned[self.version_name]
+
+    def _load(self, version):
+        objects = list(self.queryset.all())
+        serializer_class = import_string(self.serializer_path)
+        renderer = JSONRenderer()
+        return ReferenceData(
+            version,
+            objects,
+            [
+                renderer.render(row)
+                for row in serializer_class(objects, many=True).data
+            ],
+        )
+
+
+tag_reference = ReferenceCache(
+    DataVersion.TAGS, Tag.objects.all(), 'api.serializers.TagSerializer'
+)
+ingredient_reference = ReferenceCache(
+    DataVersion.INGREDIENTS,
+    Ingredient.objects.all(),
+    'api.serializers.IngredientSerializer',
+)
@@ -1,31 +1,114 @@
 import base64
+import binascii
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
 from django.core.validators import RegexValidator
+from django.db import transaction
 from foodgram.settings import MIN_VALUE
 from rest_framework import serializers
-from rest_framework.generics import get_object_or_404
 from users.models import Subscription, User
 
+from . import shopping_totals
+from .jobs import enqueue
 from .models import (
     Favorite,
     Ingredient,
+    Job,
     Recipe,
     RecipeIngredientAmount,
     ShoppingCart,
     Tag,
 )
+from .reference import ingredient_reference, tag_reference
+from .storage import image_storage
+from .viewer import get_viewer_state
+
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+def decode_base64_file(data, offset, name, content_type):
+    """Декодирует base64 из data, начиная с offset, во временный файл.
+
+    Строка читается фрагментами, поэтому в памяти одновременно находится
+    только очередной фрагмент, а не вторая полная копия изображения.
+    """
+    file = TemporaryUploadedFile(name, content_type, 0, None)
+    remainder = ''
+    for start in range(offset, len(data), BASE64_CHUNK_SIZE):
+        chunk = remainder + ''.join(
+            data[start:start + BASE64_CHUNK_SIZE].split()
+        )
+        end = len(chunk) - len(chunk) % 4
+        file.write(base64.b64decode(chunk[:end], validate=True))
+        remainder = chunk[end:]
+    if remainder:
+        file.close()
+        raise binascii.Error('Incorrect padding')
+    file.size = file.tell()
+    file.seek(0)
+    return file
 
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
+        max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+        too_large = serializers.ValidationError(
+            'Размер изображения не может превышать '
+            f'{max_bytes // 1024 // 1024} МБ.'
+        )
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            marker = ';base64,'
+            try:
+                offset = data.index(marker)
+            except ValueError:
+                self.fail('invalid_image')
+            format = data[:offset]
+            offset += len(marker)
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            if (len(data) - offset) // 4 * 3 > max_bytes + 2:
+                raise too_large
+            try:
+                data = decode_base64_file(
+                    data, offset, 'temp.' + ext, format.split(':')[-1]
+                )
+            except binascii.Error:
+                self.fail('invalid_image')
+        if getattr(data, 'size', 0) > max_bytes:
+            raise too_large
         return super().to_internal_value(data)
 
 
+def get_image_url(recipe, variant, context):
+    """Абсолютная ссылка на уменьшенную копию изображения рецепта."""
+    name = recipe.get_image_name(variant)
+    if not name:
+        return None
+    url = recipe.image.storage.url(name)
+    request = context.get('request')
+    return request.build_absolute_uri(url) if request else url
+
+
+class ReferencePrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Ищет объекты в кеше справочника, а не отдельным запросом на id."""
+
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.reference.for_request(
+                self.context.get('request')
+            ).objects[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed'
@@ -43,11 +126,7 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, author):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and Subscription.objects.filter(user=user, author=author).exists()
-        )
+        return get_viewer_state(self.context).is_subscribed(author)
 
 
 class UserSubSerializer(serializers.ModelSerializer):
@@ -76,13 +155,15 @@ class UserSubSerializer(serializers.ModelSerializer):
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
+    """Автор из подписок пользователя.
+
+    Ожидает авторов с аннотациями recipes_count и is_subscribed и
+    последними рецептами, загруженными в latest_recipes.
+    """
+
     recipes = serializers.SerializerMethodField(method_name='get_recipes')
-    recipes_count = serializers.SerializerMethodField(
-        method_name='get_recipes_count'
-    )
-    is_subscribed = serializers.SerializerMethodField(
-        method_name='get_is_subscribed'
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
+    is_subscribed = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = User
@@ -98,31 +179,10 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes(self, author):
-        recipes = recipes_limit = None
-        request = self.context.get('request')
-        if request:
-            recipes_limit = request.query_params.get('recipes_limit')
-        recipes = (
-            author.recipes.all()[: int(recipes_limit)]
-            if recipes_limit
-            else author.recipes.all()
-        )
         return RecipePartialSerializer(
-            recipes, many=True, context={'request': request}
+            author.latest_recipes, many=True, context=self.context
         ).data
 
-    def get_recipes_count(self, author):
-        return author.recipes.count()
-
-    def get_is_subscribed(self, author):
-        request = self.context.get('request')
-        return (
-            request.user.is_authenticated
-            and Subscription.objects.filter(
-                user=request.user, author=author
-            ).exists()
-        )
-
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -173,8 +233,8 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
     author = serializers.HiddenField(default=serializers.CurrentUserDefault())
     ingredients = IngredientAddSerializer(many=True, source='ingredient')
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
+    tags = ReferencePrimaryKeyRelatedField(
+        many=True, queryset=Tag.objects.all(), reference=tag_reference
     )
 
     class Meta:
@@ -210,39 +270,125 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'В рецепте не должно быть повторяющихся ингредиентов!'
             )
+        known_ingredients = ingredient_reference.for_request(
+            self.context.get('request')
+        ).objects
+        missing = sorted(
+            set(list_of_ingredients).difference(known_ingredients)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                {
+                    'ingredients': 'Ингредиенты не найдены: '
+                    f'{", ".join(map(str, missing))}.'
+                }
+            )
+        if data.get('image') is not None:
+            data['image_hash'] = image_storage.get_content_hash(data['image'])
         return data
 
     @staticmethod
-    def add_ingredients(recipe, ingredients):
-        list_of_ingredients = []
-        for ingredient in ingredients:
-            cur_ingredient = get_object_or_404(
-                Ingredient, id=ingredient.get('id')
-            )
-            list_of_ingredients.append(
-                RecipeIngredientAmount(
-                    recipe=recipe,
-                    ingredient=cur_ingredient,
-                    amount=ingredient.get('amount'),
-                )
+    def get_amounts(ingredients):
+        return {
+            ingredient.get('id'): ingredient.get('amount')
+            for ingredient in ingredients
+        }
+
+    @staticmethod
+    def add_ingredients(recipe, amounts):
+        RecipeIngredientAmount.objects.bulk_create(
+            RecipeIngredientAmount(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
             )
-        RecipeIngredientAmount.objects.bulk_create(list_of_ingredients)
+            for ingredient_id, amount in amounts.items()
+        )
+
+    @classmethod
+    def update_ingredients(cls, recipe, amounts):
+        """Приводит состав рецепта к amounts, меняя только отличия.
+
+        Возвращает прежний состав: id ингредиента -> количество.
+        """
+        rows = {
+            row.ingredient_id: row
+            for row in RecipeIngredientAmount.objects.filter(recipe=recipe)
+        }
+        removed = [
+            row.id
+            for ingredient_id, row in rows.items()
+            if ingredient_id not in amounts
+        ]
+        changed = [
+            RecipeIngredientAmount(id=rows[ingredient_id].id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id in rows and rows[ingredient_id].amount != amount
+        ]
+        if removed:
+            RecipeIngredientAmount.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredientAmount.objects.bulk_update(changed, ('amount',))
+        cls.add_ingredients(
+            recipe,
+            {
+                ingredient_id: amount
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in rows
+            },
+        )
+        return {
+            ingredient_id: row.amount for ingredient_id, row in rows.items()
+        }
 
+    @staticmethod
+    def is_stored_image(recipe, validated_data):
+        """Совпадает ли загруженное изображение с уже сохраненным.
+
+        Сравнивается хеш загрузки: сохраненный оригинал мог быть уменьшен
+        при обработке и отличаться от присланного файла.
+        """
+        return bool(recipe.image_hash) and (
+            recipe.image_hash == validated_data.get('image_hash')
+        )
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredient')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        self.add_ingredients(recipe, ingredients)
+        self.add_ingredients(recipe, self.get_amounts(ingredients))
+        enqueue('recipe_image_variants', {'recipe_id': recipe.id})
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredient')
-        instance.ingredients.clear()
-        self.add_ingredients(instance, ingredients)
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        return super().update(instance, validated_data)
+        amounts = self.get_amounts(validated_data.pop('ingredient'))
+        old_amounts = self.update_ingredients(instance, amounts)
+        shopping_totals.apply_recipe_change(instance.id, old_amounts, amounts)
+        instance.tags.set(validated_data.pop('tags'))
+        if self.is_stored_image(instance, validated_data):
+            del validated_data['image']
+            del validated_data['image_hash']
+        if 'image' in validated_data:
+            validated_data['image_variants'] = {}
+            enqueue('recipe_image_variants', {'recipe_id': instance.id})
+        changed = [
+            attr
+            for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        for attr in changed:
+            setattr(instance, attr, validated_data[attr])
+        instance.save(update_fields=(*changed, 'modified'))
+        return instance
 
     def to_representation(self, instance):
         return RecipeRetrieveSerializer(
@@ -250,9 +396,17 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         ).data
 
 
+class RecipeBulkItemSerializer(RecipeCreateUpdateSerializer):
+    """Рецепт из пакета. Уникальность названий пакета проверяется вместе."""
+
+    class Meta(RecipeCreateUpdateSerializer.Meta):
+        validators = []
+
+
 class RecipeRetrieveSerializer(serializers.ModelSerializer):
     author = UserSerializer()
-    image = Base64ImageField(read_only=True)
+    image = serializers.SerializerMethodField(method_name='get_image')
+    images = serializers.SerializerMethodField(method_name='get_images')
     ingredients = IngredientsInRecipeSerializer(
         many=True, source='recipe_ing', read_only=True
     )
@@ -275,30 +429,37 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
         )
 
+    def get_image(self, recipe):
+        return get_image_url(recipe, 'detail', self.context)
+
+    def get_images(self, recipe):
+        return {
+            variant: get_image_url(recipe, variant, self.context)
+            for variant in (*settings.RECIPE_IMAGE_VARIANTS, 'original')
+        }
+
     def get_is_favorited(self, recipe):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and Favorite.objects.filter(user=user, recipe=recipe).exists()
-        )
+        return get_viewer_state(self.context).is_favorited(recipe)
 
     def get_is_in_shopping_cart(self, recipe):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and ShoppingCart.objects.filter(user=user, recipe=recipe).exists()
-        )
+        return get_viewer_state(self.context).is_in_shopping_cart(recipe)
 
 
 class RecipePartialSerializer(serializers.ModelSerializer):
+    image = serializers.SerializerMethodField(method_name='get_image')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, recipe):
+        return get_image_url(recipe, 'thumbnail', self.context)
+
 
 class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -334,3 +495,18 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         return RecipePartialSerializer(
             instance.recipe, context={'request': self.context.get('request')}
         ).data
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = (
+            'id',
+            'kind',
+            'status',
+            'attempts',
+            'result',
+            'error',
+            'created',
+            'modified',
+        )
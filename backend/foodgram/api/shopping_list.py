@@ -0,0 +1,160 @@
+import csv
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+
+from .models import ShoppingListItem
+
+FONT_NAME = 'Arial'
+CHUNK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    """Разбирает файл шрифта один раз за время жизни процесса."""
+    pdfmetrics.registerFont(
+        TTFont(FONT_NAME, os.path.join(settings.BASE_DIR, 'fonts/arial.ttf'))
+    )
+
+
+class ShoppingListRenderer:
+    """Формирует файл списка покупок по частям.
+
+    ingredients — последовательность кортежей
+    (название, единица измерения, общее количество).
+    """
+
+    extension = None
+    content_type = None
+
+    def render(self, user, ingredients, today):
+        raise NotImplementedError
+
+    @staticmethod
+    def format_line(index, ingredient):
+        name, measurement_unit, amount = ingredient
+        return f'{index}) {name} - {amount} {measurement_unit}'
+
+
+class PDFRenderer(ShoppingListRenderer):
+    extension = 'pdf'
+    content_type = 'application/pdf'
+
+    def render(self, user, ingredients, today):
+        register_font()
+        buffer = io.BytesIO()
+        offset = 700
+        pdf = Canvas(buffer)
+        pdf.setFont(FONT_NAME, 18)
+        pdf.drawString(150, 750, f'Список покупок для {user.username}')
+        pdf.setFontSize(14)
+        for index, ingredient in enumerate(ingredients, start=1):
+            pdf.drawString(80, offset, self.format_line(index, ingredient))
+            offset -= 30
+            if offset < 80:
+                pdf.showPage()
+                pdf.setFont(FONT_NAME, 14)
+                offset = 750
+        pdf.drawString(130, 50, f'Файл сгенерирован Foodgram {today:%d.%m.%Y}')
+        pdf.save()
+        content = buffer.getbuffer()
+        for start in range(0, len(content), CHUNK_SIZE):
+            yield bytes(content[start:start + CHUNK_SIZE])
+
+
+class TextRenderer(ShoppingListRenderer):
+    extension = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def render(self, user, ingredients, today):
+        yield f'Список покупок для {user.username}\n\n'.encode()
+        for index, ingredient in enumerate(ingredients, start=1):
+            yield f'{self.format_line(index, ingredient)}\n'.encode()
+        yield f'\nФайл сгенерирован Foodgram {today:%d.%m.%Y}\n'.encode()
+
+
+class CSVRenderer(ShoppingListRenderer):
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def render(self, user, ingredients, today):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+        for name, measurement_unit, amount in ingredients:
+            writer.writerow((name, amount, measurement_unit))
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode()
+
+
+RENDERERS = {
+    renderer.extension: renderer()
+    for renderer in (PDFRenderer, TextRenderer, CSVRenderer)
+}
+
+
+def get_shopping_list(user):
+    return tuple(
+        ShoppingListItem.objects.filter(user=user)
+        .order_by('ingredient__name')
+        .values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        )
+    )
+
+
+def get_filename(user, file_format):
+    return f'{user.username}\'s_shopping_list.{file_format}'
+
+
+def get_cart_version(ingredients, today):
+    """Отпечаток содержимого списка покупок и даты в подписи файла."""
+    return hashlib.md5(repr((ingredients, today)).encode()).hexdigest()
+
+
+def _stream_and_cache(chunks, key):
+    rendered = []
+    for chunk in chunks:
+        rendered.append(chunk)
+        yield chunk
+    cache.set(key, rendered, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def shopping_list_response(user, ingredients, file_format):
+    """Отдает файл списка покупок потоком.
+
+    Готовый файл кешируется по пользователю, формату и версии корзины,
+    поэтому повторное скачивание неизменной корзины не формирует его
+    заново.
+    """
+    renderer = RENDERERS[file_format]
+    today = timezone.now().date()
+    key = (
+        f'shopping-list:{user.id}:{file_format}:'
+        f'{get_cart_version(ingredients, today)}'
+    )
+    chunks = cache.get(key)
+    if chunks is None:
+        chunks = _stream_and_cache(
+            renderer.render(user, ingredients, today), key
+        )
+    filename = get_filename(user, file_format)
+    return StreamingHttpResponse(
+        chunks,
+        content_type=renderer.content_type,
+        headers={
+            'Content-Disposition': content_disposition_header(True, filename)
+        },
+    )
@@ -0,0 +1,120 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Sum
+from users.models import User
+
+from .models import RecipeIngredientAmount, ShoppingCart, ShoppingListItem
+
+
+def get_recipe_amounts(recipe_id):
+    return Counter(
+        dict(
+            RecipeIngredientAmount.objects.filter(recipe_id=recipe_id)
+            .order_by()
+            .values_list('ingredient_id', 'amount')
+        )
+    )
+
+
+def lock_users(user_ids):
+    """Блокирует строки пользователей до конца транзакции.
+
+    Изменения списков покупок одного пользователя выполняются по очереди:
+    select_for_update по позициям не защищает от одновременного создания
+    еще не существующей позиции. Строки блокируются по порядку id, чтобы
+    транзакции не ждали друг друга по кругу.
+    """
+    list(
+        User.objects.select_for_update(no_key=True)
+        .filter(id__in=user_ids)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+@transaction.atomic
+def apply_amounts(user_ids, amounts):
+    """Прибавляет к спискам покупок пользователей количества ингредиентов.
+
+    amounts — словарь id ингредиента -> изменение количества, отрицательное
+    при удалении. Позиции, количество которых стало нулевым, удаляются.
+    """
+    amounts = {key: value for key, value in amounts.items() if value}
+    if not user_ids or not amounts:
+        return
+    lock_users(user_ids)
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id__in=amounts
+        )
+    }
+    created, updated, deleted = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, amount in amounts.items():
+            item = items.get((user_id, ingredient_id))
+            if item is None:
+                if amount > 0:
+                    created.append(
+                        ShoppingListItem(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=amount,
+                        )
+                    )
+                continue
+            item.amount += amount
+            if item.amount > 0:
+                updated.append(item)
+            else:
+                deleted.append(item.id)
+    ShoppingListItem.objects.bulk_create(created)
+    ShoppingListItem.objects.bulk_update(updated, ('amount',))
+    ShoppingListItem.objects.filter(id__in=deleted).delete()
+
+
+def get_cart_user_ids(recipe_id):
+    return list(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True
+        )
+    )
+
+
+def apply_recipe_change(recipe_id, old_amounts, new_amounts):
+    """Переносит изменение состава рецепта в списки покупок."""
+    amounts = Counter(new_amounts)
+    amounts.subtract(old_amounts)
+    apply_amounts(get_cart_user_ids(recipe_id), amounts)
+
+
+def remove_recipe(recipe_id, user_ids):
+    """Вычитает рецепт из списков покупок пользователей."""
+    apply_amounts(
+        user_ids,
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+        },
+    )
+
+
+@transaction.atomic
+def rebuild(user_ids):
+    """Пересчитывает списки покупок пользователей по их корзинам."""
+    lock_users(user_ids)
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['recipe__shopping_cart__user'],
+            ingredient_id=row['ingredient'],
+            amount=row['total_amount'],
+        )
+        for row in RecipeIngredientAmount.objects.filter(
+            recipe__shopping_cart__user__in=user_ids
+        )
+        .order_by()
+        .values('recipe__shopping_cart__user', 'ingredient')
+        .annotate(total_amount=Sum('amount'))
+    )
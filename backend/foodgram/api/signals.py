@@ -0,0 +1,164 @@
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.db.models import QuerySet
+from django.dispatch import receiver
+from django.utils import timezone
+from users.models import Subscription, User
+
+from . import counters, feed, shopping_totals
+from .jobs import schedule_image_release
+from .models import (
+    DataVersion,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+
+
+def touch_recipes(recipes):
+    """Обновляет дату изменения, чтобы сбросить кеш документов рецептов."""
+    if recipes.update(modified=timezone.now()):
+        DataVersion.bump(DataVersion.RECIPES)
+
+
+def is_deleted_with(origin, models):
+    """Удаляется ли строка каскадом при удалении объектов models.
+
+    models — модель или кортеж моделей, origin — аргумент сигнала
+    удаления: объект или queryset, с которого началось удаление.
+    """
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, models)
+    return isinstance(origin, models)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def bump_recipes_version(sender, **kwargs):
+    DataVersion.bump(DataVersion.RECIPES)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_image_files(sender, instance, update_fields, **kwargs):
+    instance._stored_image_files = set()
+    if instance.pk is None or (
+        update_fields is not None
+        and not {'image', 'image_variants'} & update_fields
+    ):
+        return
+    stored = (
+        Recipe.objects.filter(pk=instance.pk)
+        .only('image', 'image_variants')
+        .first()
+    )
+    if stored is not None:
+        instance._stored_image_files = stored.get_image_files()
+
+
+@receiver(post_save, sender=Recipe)
+def release_replaced_image_files(sender, instance, **kwargs):
+    schedule_image_release(
+        getattr(instance, '_stored_image_files', set())
+        - instance.get_image_files()
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_image_files(sender, instance, **kwargs):
+    schedule_image_release(instance.get_image_files())
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out([instance])
+
+
+@receiver(post_save, sender=Subscription)
+def follow_author(sender, instance, created, **kwargs):
+    if created:
+        feed.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def unfollow_author(sender, instance, **kwargs):
+    feed.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    DataVersion.bump(DataVersion.TAGS)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    DataVersion.bump(DataVersion.INGREDIENTS)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(recipe_ing__ingredient=instance))
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        shopping_totals.apply_amounts(
+            [instance.user_id],
+            shopping_totals.get_recipe_amounts(instance.recipe_id),
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, origin=None, **kwargs):
+    if is_deleted_with(origin, (Recipe, User)):
+        return
+    shopping_totals.remove_recipe(instance.recipe_id, [instance.user_id])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    """Вычитает удаляемый рецепт из всех списков покупок сразу.
+
+    Строки корзин удаляются каскадом и пропускаются обработчиком выше.
+    """
+    shopping_totals.remove_recipe(
+        instance.id, shopping_totals.get_cart_user_ids(instance.id)
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        counters.change(sender, instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_counter(sender, instance, origin=None, **kwargs):
+    if is_deleted_with(origin, Recipe):
+        return
+    counters.change(sender, instance.recipe_id, -1)
@@ -0,0 +1,51 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DataVersion, Favorite, ShoppingCart, TrendingRecipe
+
+WEIGHTS = {
+    Favorite: 1.0,
+    ShoppingCart: 0.5,
+}
+
+
+def compute_scores(now):
+    """Рейтинг рецептов по добавлениям за TRENDING_WINDOW_DAYS.
+
+    Вклад каждого добавления убывает вдвое за TRENDING_HALF_LIFE_HOURS,
+    поэтому свежие добавления весят больше старых.
+    """
+    since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    half_life = timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+    scores = defaultdict(float)
+    for model, weight in WEIGHTS.items():
+        for recipe_id, created in (
+            model.objects.filter(created__gte=since)
+            .order_by()
+            .values_list('recipe_id', 'created')
+            .iterator()
+        ):
+            scores[recipe_id] += weight * 0.5 ** ((now - created) / half_life)
+    return scores
+
+
+@transaction.atomic
+def update():
+    """Заменяет таблицу популярных рецептов свежим рейтингом."""
+    top = heapq.nlargest(
+        settings.TRENDING_SIZE,
+        compute_scores(timezone.now()).items(),
+        key=lambda item: item[1],
+    )
+    TrendingRecipe.objects.all().delete()
+    TrendingRecipe.objects.bulk_create(
+        TrendingRecipe(recipe_id=recipe_id, score=score)
+        for recipe_id, score in top
+    )
+    DataVersion.bump(DataVersion.RECIPES)
+    return len(top)
@@ -2,13 +2,14 @@ from django.urls import include, path
 from rest_framework import routers
 from users.views import UserViewSet
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+from .views import IngredientViewSet, JobViewSet, RecipeViewSet, TagViewSet
 
 router = routers.DefaultRouter()
 router.register('users', UserViewSet)
 router.register('tags', TagViewSet)
 router.register('recipes', RecipeViewSet)
 router.register('ingredients', IngredientViewSet)
+router.register('jobs', JobViewSet, basename='jobs')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
@@ -0,0 +1,74 @@
+import hashlib
+
+from django.utils.functional import cached_property
+from users.models import Subscription
+
+from .models import Favorite, ShoppingCart
+
+
+class ViewerState:
+    """Избранное, список покупок и подписки пользователя.
+
+    Каждый набор загружается одним запросом при первом обращении и затем
+    используется всеми сериализаторами в рамках запроса.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @classmethod
+    def for_request(cls, request):
+        state = getattr(request, '_viewer_state', None)
+        if state is None or state.user != request.user:
+            state = cls(request.user)
+            request._viewer_state = state
+        return state
+
+    def _load_ids(self, queryset, field):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def favorite_ids(self):
+        return self._load_ids(Favorite.objects, 'recipe_id')
+
+    @cached_property
+    def cart_ids(self):
+        return self._load_ids(ShoppingCart.objects, 'recipe_id')
+
+    @cached_property
+    def subscribed_ids(self):
+        return self._load_ids(Subscription.objects, 'author_id')
+
+    @cached_property
+    def version(self):
+        """Отпечаток состояния, меняющийся вместе с любым из наборов."""
+        if not self.user.is_authenticated:
+            return 'anonymous'
+        state = repr(
+            (
+                self.user.id,
+                sorted(self.favorite_ids),
+                sorted(self.cart_ids),
+                sorted(self.subscribed_ids),
+            )
+        )
+        return hashlib.md5(state.encode()).hexdigest()
+
+    def is_favorited(self, recipe):
+        return recipe.id in self.favorite_ids
+
+    def is_in_shopping_cart(self, recipe):
+        return recipe.id in self.cart_ids
+
+    def is_subscribed(self, author):
+        return author.id in self.subscribed_ids
+
+
+def get_viewer_state(context):
+    if 'viewer_state' in context:
+        return context['viewer_state']
+    return ViewerState.for_request(context.get('request'))
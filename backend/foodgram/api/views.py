@@ -1,52 +1,81 @@
-import os
-from io import BytesIO
-
-from django.db.models import Sum
+from django.conf import settings
 from django.db.models.expressions import Exists, OuterRef, Value
-from django.http import FileResponse
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
-from foodgram.settings import BASE_DIR
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen.canvas import Canvas
-from rest_framework import permissions, status, viewsets
+from rest_framework import mixins, permissions, serializers, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
-from .filters import IngredientFilter, RecipeFilter
+from .bulk import create_recipes
+from .conditional import popularity_stamp, versioned_condition
+from .documents import get_recipe_documents
+from .filters import (
+    RecipeFilter,
+    RecipeOrderingFilter,
+    get_positive_int_param,
+    get_query_param,
+)
+from .jobs import enqueue
 from .models import (
+    DataVersion,
     Favorite,
+    FeedEntry,
     Ingredient,
+    Job,
     Recipe,
-    RecipeIngredientAmount,
     ShoppingCart,
     Tag,
+    TrendingRecipe,
 )
+from .pagination import FeedPagination, PageNumberOrCursorPagination
+from .parsers import MultiPartJSONParser
 from .permissions import IsAdminOwnerOrReadOnly
+from .reference import ingredient_reference, render_rows, tag_reference
 from .serializers import (
     FavoriteSerializer,
     IngredientSerializer,
+    JobSerializer,
+    RecipeBulkItemSerializer,
     RecipeCreateUpdateSerializer,
+    RecipePartialSerializer,
     RecipeRetrieveSerializer,
     ShoppingCartSerializer,
     TagSerializer,
 )
+from .shopping_list import (
+    RENDERERS,
+    get_shopping_list,
+    shopping_list_response,
+)
 
 
+@method_decorator(versioned_condition(DataVersion.TAGS), name='list')
+@method_decorator(versioned_condition(DataVersion.TAGS), name='retrieve')
 class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return HttpResponse(
+            tag_reference.get().content, content_type='application/json'
+        )
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAdminOwnerOrReadOnly,)
+    pagination_class = PageNumberOrCursorPagination
     http_method_names = ['get', 'post', 'patch', 'delete']
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('favorites_count', 'id')
+    parser_classes = (JSONParser, MultiPartJSONParser)
+    json_form_fields = ('ingredients', 'tags')
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
@@ -66,11 +95,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
                         user=self.request.user, recipe=OuterRef('id')
                     )
                 ),
-            ).select_related('author')
+            )
         return Recipe.objects.annotate(
             is_in_shopping_cart=Value(False),
             is_favorited=Value(False),
-        ).select_related('author')
+        )
+
+    @method_decorator(
+        versioned_condition(
+            DataVersion.RECIPES, per_viewer=True, stamp=popularity_stamp
+        )
+    )
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.only('id', 'modified'))
+        return self.get_paginated_response(
+            get_recipe_documents(
+                page, self.get_serializer_context(), image_variant='card'
+            )
+        )
+
+    @method_decorator(
+        versioned_condition(DataVersion.RECIPES, per_viewer=True)
+    )
+    def retrieve(self, request, *args, **kwargs):
+        (document,) = get_recipe_documents(
+            [self.get_object()], self.get_serializer_context()
+        )
+        return Response(document)
 
     @action(methods=['post', 'delete'], detail=True)
     def favorite(self, request, pk):
@@ -122,52 +174,211 @@ class RecipeViewSet(viewsets.ModelViewSet):
         methods=['get'],
         detail=False,
         permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=FeedPagination,
+        filter_backends=(),
     )
-    def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredientAmount.objects.select_related('recipe')
-            .filter(recipe__shopping_cart__user=request.user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .order_by('ingredient__name')
-            .annotate(total_amount=Sum('amount'))
-        )
-        today = timezone.now().today()
-        buffer = BytesIO()
-        offset = 700
-        pdf = Canvas(buffer)
-        font_path = os.path.join(BASE_DIR, 'fonts/arial.ttf')
-        pdfmetrics.registerFont(TTFont('Arial', font_path))
-        pdf.setFont('Arial', 18)
-        pdf.drawString(150, 750, f'Список покупок для {request.user.username}')
-        pdf.setFontSize(14)
-        for index, ingredient in enumerate(ingredients, start=1):
-            pdf.drawString(
-                80,
-                offset,
-                (
-                    f'{index}) {ingredient["ingredient__name"]} -'
-                    f' {ingredient["total_amount"]}'
-                    f' {ingredient["ingredient__measurement_unit"]}'
-                ),
+    @method_decorator(
+        versioned_condition(DataVersion.RECIPES, per_viewer=True)
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок, начиная с новых.
+
+        Читается готовая лента пользователя из FeedEntry, которая
+        пополняется при создании рецептов и подписке на авторов.
+        """
+        entries = self.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user)
+            .select_related('recipe')
+            .only('recipe', 'recipe__modified')
+        )
+        return self.get_paginated_response(
+            get_recipe_documents(
+                [entry.recipe for entry in entries],
+                self.get_serializer_context(),
+                image_variant='card',
+            )
+        )
+
+    @action(
+        methods=['get'],
+        detail=False,
+        pagination_class=None,
+        filter_backends=(),
+    )
+    @method_decorator(
+        versioned_condition(DataVersion.RECIPES, per_viewer=True)
+    )
+    def trending(self, request):
+        """Популярные рецепты из заранее рассчитанного рейтинга."""
+        entries = TrendingRecipe.objects.select_related('recipe').only(
+            'recipe', 'recipe__modified'
+        )
+        tags = request.query_params.getlist('tags')
+        if tags:
+            entries = entries.filter(
+                Exists(
+                    Recipe.tags.through.objects.filter(
+                        recipe_id=OuterRef('recipe_id'), tag__slug__in=tags
+                    )
+                )
+            )
+        limit = get_positive_int_param(request, 'limit')
+        return Response(
+            get_recipe_documents(
+                [entry.recipe for entry in entries[:limit]],
+                self.get_serializer_context(),
+                image_variant='card',
             )
-            offset -= 30
-            if offset < 80:
-                pdf.showPage()
-                pdf.setFont('Arial', 14)
-                offset = 750
-        pdf.drawString(130, 50, f'Файл сгенерирован Foodgram {today:%d.%m.%Y}')
-        pdf.save()
-        buffer.seek(0)
-        return FileResponse(
-            buffer,
-            as_attachment=True,
-            filename=f'{request.user.username}\'s_shopping_list.pdf',
         )
 
+    @action(
+        methods=['post'],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+        parser_classes=(JSONParser,),
+    )
+    def bulk(self, request):
+        """Создает пакет рецептов и возвращает результат по каждому.
+
+        Названия всего пакета проверяются на уникальность одним запросом,
+        а корректные рецепты вставляются несколькими пакетными запросами.
+        """
+        if (
+            not isinstance(request.data, list)
+            or not 0 < len(request.data) <= settings.RECIPE_BULK_MAX_SIZE
+        ):
+            raise serializers.ValidationError(
+                'Ожидается список из не более чем '
+                f'{settings.RECIPE_BULK_MAX_SIZE} рецептов.'
+            )
+        context = self.get_serializer_context()
+        items = [
+            RecipeBulkItemSerializer(data=data, context=context)
+            for data in request.data
+        ]
+        errors = {
+            index: item.errors
+            for index, item in enumerate(items)
+            if not item.is_valid()
+        }
+        taken = set(
+            Recipe.objects.filter(
+                author=request.user,
+                name__in=[item.validated_data.get('name') for item in items],
+            ).values_list('name', flat=True)
+        )
+        entries = {}
+        for index, item in enumerate(items):
+            if index in errors:
+                continue
+            name = item.validated_data['name']
+            if name in taken:
+                errors[index] = {
+                    'name': ['У пользователя уже есть рецепт с таким '
+                             'названием!']
+                }
+                continue
+            taken.add(name)
+            entries[index] = item.validated_data
+        try:
+            created = dict(
+                zip(entries, create_recipes(list(entries.values())))
+            )
+        finally:
+            for item in items:
+                image = item.validated_data.get('image')
+                if image is not None:
+                    image.close()
+        results = [
+            {
+                'status': status.HTTP_201_CREATED,
+                'recipe': RecipePartialSerializer(
+                    created[index], context=context
+                ).data,
+            }
+            if index in created
+            else {
+                'status': status.HTTP_400_BAD_REQUEST,
+                'errors': errors[index],
+            }
+            for index in range(len(items))
+        ]
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(results, status=response_status)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def download_shopping_cart(self, request):
+        """Файл списка покупок.
+
+        По умолчанию файл отдается сразу. С параметром async=1 большой
+        список формируется в фоне: в ответ приходит задача со ссылкой на
+        файл в результате.
+        """
+        file_format = get_query_param(
+            request,
+            'type',
+            serializers.ChoiceField(choices=tuple(RENDERERS)),
+            default='pdf',
+        )
+        in_background = get_query_param(
+            request, 'async', serializers.BooleanField(), default=False
+        )
+        ingredients = get_shopping_list(request.user)
+        if (
+            in_background
+            and len(ingredients) > settings.SHOPPING_LIST_ASYNC_THRESHOLD
+        ):
+            job = enqueue(
+                'shopping_list', {'file_format': file_format}, request.user
+            )
+            return Response(
+                JobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED,
+                headers={
+                    'Location': reverse(
+                        'jobs-detail', args=(job.id,), request=request
+                    )
+                },
+            )
+        return shopping_list_response(request.user, ingredients, file_format)
 
+
+@method_decorator(versioned_condition(DataVersion.INGREDIENTS), name='list')
+@method_decorator(
+    versioned_condition(DataVersion.INGREDIENTS), name='retrieve'
+)
 class IngredientViewSet(viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
+
+    def list(self, request, *args, **kwargs):
+        reference = ingredient_reference.get()
+        name = request.query_params.get('name')
+        if not name:
+            return HttpResponse(
+                reference.content, content_type='application/json'
+            )
+        rows = reference.name_index.search(
+            name, limit=get_positive_int_param(request, 'limit')
+        )
+        return HttpResponse(
+            render_rows(rows), content_type='application/json'
+        )
+
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = JobSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -70,6 +71,13 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -133,6 +141,56 @@ DJOSER = {
 
 MIN_VALUE = 1
 
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'detail': (1024, 1024),
+}
+
+RECIPE_IMAGE_FORMAT = 'WEBP'
+
+RECIPE_IMAGE_MAX_SIDE = 2048
+
+RECIPE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+RECIPE_IMAGE_RELEASE_DELAY = 60 * 60
+
+RECIPE_BULK_MAX_SIZE = 100
+
+FEED_BATCH_SIZE = 1000
+
+TRENDING_SIZE = 50
+
+TRENDING_WINDOW_DAYS = 7
+
+TRENDING_HALF_LIFE_HOURS = 48
+
+EXPORT_CHUNK_SIZE = 2000
+
+RECIPE_DOCUMENT_TIMEOUT = 60 * 60 * 24
+
+PAGINATION_COUNT_TIMEOUT = 30
+
+RECIPE_POPULARITY_ETAG_INTERVAL = 60
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+
+SHOPPING_LIST_ASYNC_THRESHOLD = 100
+
+SHOPPING_LIST_FILE_TIMEOUT = 60 * 60 * 24
+
+JOB_POLL_INTERVAL = 5
+
+JOB_LEASE_TIMEOUT = 10 * 60
+
+JOB_RETRY_DELAY = 30
+
+JOB_DELETE_BATCH_SIZE = 100
+
+JOB_RETENTION_DAYS = 7
+
+JOB_PRUNE_INTERVAL = 60 * 60
+
 CSRF_TRUSTED_ORIGINS = [
     'http://51.250.16.24',
     'http://mrhyde-foodgram.sytes.net',
@@ -1,18 +1,21 @@
+from api.admin import ChangeListAdmin, export_csv, input_filter
 from django.contrib import admin
 
 from .models import Subscription, User
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(ChangeListAdmin):
     list_display = ('username', 'email')
     search_fields = ('email', 'username')
-    list_filter = ('email', 'username')
-    list_per_page = 30
+    list_filter = ('is_staff', 'is_active')
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
-    search_fields = ('user', 'author')
-    list_filter = ('author',)
-    list_per_page = 30
+class SubscriptionAdmin(ChangeListAdmin):
+    list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username__exact', 'author__username__exact')
+    list_filter = (input_filter('author__username', 'автору'),)
+    autocomplete_fields = ('user', 'author')
+    actions = (export_csv,)
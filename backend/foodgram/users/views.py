@@ -1,8 +1,12 @@
+from api.filters import get_positive_int_param
+from api.models import Recipe
+from api.pagination import PageNumberOrCursorPagination
 from api.serializers import (
     SubscriptionSerializer,
     UserSerializer,
     UserSubSerializer,
 )
+from django.db.models import Count, Prefetch, Value, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
@@ -14,6 +18,7 @@ from .models import Subscription, User
 
 class UserViewSet(UserViewSet):
     serializer_class = UserSerializer
+    pagination_class = PageNumberOrCursorPagination
 
     @action(methods=['get'], detail=False)
     def me(self, request, *args, **kwargs):
@@ -21,8 +26,23 @@ class UserViewSet(UserViewSet):
 
     @action(methods=['get'], detail=False)
     def subscriptions(self, request):
-        queryset = User.objects.filter(subscription__user=request.user)
+        recipes_limit = get_positive_int_param(request, 'recipes_limit')
+        # Запрос с GROUP BY не получает сортировку из Meta.ordering.
+        queryset = (
+            User.objects.filter(subscription__user=request.user)
+            .annotate(
+                recipes_count=Count('recipes'), is_subscribed=Value(True)
+            )
+            .order_by('username')
+        )
         page = self.paginate_queryset(queryset)
+        recipes = Recipe.objects.all()
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+        prefetch_related_objects(
+            page,
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes'),
+        )
         serializer = SubscriptionSerializer(
             page, many=True, context={'request': request}
         )